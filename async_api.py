@@ -0,0 +1,33 @@
+import asyncio
+import functools
+
+from storage import SQLiteStore
+
+
+class AsyncManager:
+    """
+    Awaitable view of a manager for callers running on an event loop, e.g.
+    await AsyncManager(ProjectBoardManager()).create_board(request)
+
+    Public methods become coroutine functions, nested managers (e.g. UserManager().team_manager) are
+    wrapped in turn, and other public attributes are returned as they are.
+    Each API call runs in the loop's default executor, where SQLiteStore gives every worker thread
+    its own connection, so concurrent requests never block the loop on database I/O.
+    """
+    def __init__(self, manager):
+        self._manager = manager
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        attribute = getattr(self._manager, name)
+        if isinstance(attribute, SQLiteStore):
+            return AsyncManager(attribute)
+        if not callable(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(attribute, *args, **kwargs)
+
+        return call
@@ -0,0 +1,5 @@
+class ApiError(ValueError):
+    """
+    Raised by the API methods for invalid input or a request that cannot be served.
+    The message is meant for the caller and carries no traceback.
+    """
@@ -0,0 +1,24 @@
+"""
+JSON encoding for API requests and responses. Uses orjson when it is installed and falls back to
+the standard library with the same compact output otherwise.
+"""
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+import json
+
+JSONDecodeError = json.JSONDecodeError
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
@@ -1,8 +1,21 @@
 from abc import ABC, abstractmethod
-import datetime
-import json
+import json_codec as json
+import logging
 import os
-import traceback
+import sqlite3
+import tempfile
+
+from errors import ApiError
+from storage import DB_PATH, SQLiteStore, utc_now
+from validation import check_id, check_ids, check_object, check_text, load_request
+
+logger = logging.getLogger(__name__)
+
+# mkstemp creates files as 0600; exports get the mode open() would give them. os.umask can only be read
+# by setting it, so that is done once at import rather than per export while other threads create files.
+_umask = os.umask(0)
+os.umask(_umask)
+EXPORT_FILE_MODE = 0o666 & ~_umask
 
 
 class ProjectBoardBase(ABC):
@@ -112,208 +125,248 @@ class ProjectBoardBase(ABC):
         """
         pass
     
-class ProjectBoardManager(ProjectBoardBase):
-    def __init__(self,db_path='db/boards.json'):
-        self.db_path=db_path
-        if not os.path.exists(self.db_path):
-            with open(self.db_path,'w') as file:
-                json.dump({},file)
+class ProjectBoardManager(ProjectBoardBase, SQLiteStore):
+    def __init__(self, db_path=DB_PATH):
+        super().__init__(db_path)
 
     def create_board(self, request: str) -> str:
         try:
-            board_data = json.loads(request)
+            board_data = load_request(request)
             name = board_data.get('name')
             description = board_data.get('description')
             team_id = board_data.get('team_id')
 
             if not name or not description or not team_id:
-                raise ValueError("Name, description, and team ID are required")
+                raise ApiError("Name, description, and team ID are required")
+            check_text(name, "Name")
+            check_text(description, "Description")
+            check_id(team_id, "Team ID")
             if len(name) > 64:
-                raise ValueError("Name must be 64 characters or less")
+                raise ApiError("Name must be 64 characters or less")
             if len(description) > 128:
-                raise ValueError("Description must be 128 characters or less")
-
-            with open(self.db_path, 'r+') as file:
-                boards = json.load(file)
-
-                if any(board['name'] == name and board['team_id'] == team_id for board in boards.values()):
-                    raise ValueError("Board name must be unique for the team, Board name already exists")
-
-                board_id = str(len(boards) + 1)
-                boards[board_id] = {
-                    "name": name,
-                    "description": description,
-                    "team_id": team_id,
-                    "status": "OPEN",
-                    "creation_time": datetime.datetime.now().isoformat(),
-                    "tasks": {}
-                }
-                file.seek(0)
-                json.dump(boards, file, indent=4)
-
-            return json.dumps({"id": board_id})
-
-        except Exception as e:
-            raise ValueError(traceback.format_exc())
+                raise ApiError("Description must be 128 characters or less")
+
+            try:
+                with self._write():
+                    cursor = self._conn.execute(
+                        "INSERT INTO boards (team_id, name, description, status, creation_time) VALUES (?, ?, ?, ?, ?)",
+                        (team_id, name, description, "OPEN", utc_now())
+                    )
+            except sqlite3.IntegrityError as e:
+                if "UNIQUE" in str(e):
+                    raise ApiError("Board name must be unique for the team, Board name already exists")
+                raise ApiError("Team not found")
+
+            return json.dumps({"id": str(cursor.lastrowid)})
+
+        except ApiError:
+            raise
+        except json.JSONDecodeError:
+            raise ApiError("Invalid JSON input")
+        except Exception:
+            logger.exception("Unexpected error in create_board")
+            raise ApiError("Internal error")
         
     def close_board(self, request: str) -> str:
         try:
-            request_data = json.loads(request)
+            request_data = load_request(request)
             board_id = request_data.get('id')
 
             if not board_id:
-                raise ValueError("Board ID is required")
+                raise ApiError("Board ID is required")
+            check_id(board_id, "Board ID")
 
-            with open(self.db_path, 'r+') as file:
-                boards = json.load(file)
+            with self._write():
+                cursor = self._conn.execute(
+                    "UPDATE boards SET status = 'CLOSED', end_time = ? WHERE id = ? "
+                    "AND NOT EXISTS (SELECT 1 FROM tasks WHERE board_id = ? AND status <> 'COMPLETE')",
+                    (utc_now(), board_id, board_id)
+                )
 
-                if board_id not in boards:
-                    raise ValueError("Board not found")
-
-                board = boards[board_id]
-
-                if any(task['status'] != "COMPLETE" for task in board['tasks'].values()):
-                    raise ValueError("Cannot close board with incomplete tasks")
-
-                board['status'] = "CLOSED"
-                board['end_time'] = datetime.datetime.now().isoformat()
-
-                file.seek(0)
-                json.dump(boards, file, indent=4)
+            if cursor.rowcount == 0:
+                if self._conn.execute("SELECT 1 FROM boards WHERE id = ?", (board_id,)).fetchone() is None:
+                    raise ApiError("Board not found")
+                raise ApiError("Cannot close board with incomplete tasks")
 
             return json.dumps({"id": board_id})
 
-        except Exception as e:
-            raise ValueError(traceback.format_exc())
+        except ApiError:
+            raise
+        except json.JSONDecodeError:
+            raise ApiError("Invalid JSON input")
+        except Exception:
+            logger.exception("Unexpected error in close_board")
+            raise ApiError("Internal error")
         
     def add_task(self, request: str) -> str:
         try:
-            task_data = json.loads(request)
+            task_data = load_request(request)
             title = task_data.get('title')
             description = task_data.get('description')
             user_id = task_data.get('user_id')
             board_id = task_data.get('board_id')
 
             if not title or not description or not user_id or not board_id:
-                raise ValueError("Title, description, user ID, and board ID are required")
+                raise ApiError("Title, description, user ID, and board ID are required")
+            check_text(title, "Title")
+            check_text(description, "Description")
+            check_id(user_id, "User ID")
+            check_id(board_id, "Board ID")
             if len(title) > 64:
-                raise ValueError("Title must be 64 characters or less")
+                raise ApiError("Title must be 64 characters or less")
             if len(description) > 128:
-                raise ValueError("Description must be 128 characters or less")
-
-            with open(self.db_path, 'r+') as file:
-                boards = json.load(file)
-
-                if board_id not in boards:
-                    raise ValueError("Board not found")
-
-                board = boards[board_id]
-
-                if board['status'] != "OPEN":
-                    raise ValueError("Cannot add task to a closed board")
-
-                if any(task['title'] == title for task in board['tasks'].values()):
-                    raise ValueError("Task title must be unique for the board")
-
-                task_id = str(len(board['tasks']) + 1)
-                board['tasks'][task_id] = {
-                    "title": title,
-                    "description": description,
-                    "user_id": user_id,
-                    "status": "OPEN",
-                    "creation_time": datetime.datetime.now().isoformat()
-                }
-
-                file.seek(0)
-                json.dump(boards, file, indent=4)
-
-            return json.dumps({"id": task_id})
-
-        except Exception as e:
-            raise ValueError(traceback.format_exc())
+                raise ApiError("Description must be 128 characters or less")
+
+            with self._write():
+                board = self._conn.execute("SELECT status FROM boards WHERE id = ?", (board_id,)).fetchone()
+
+                if board is None:
+                    raise ApiError("Board not found")
+                if board[0] != "OPEN":
+                    raise ApiError("Cannot add task to a closed board")
+
+                try:
+                    cursor = self._conn.execute(
+                        "INSERT INTO tasks (board_id, title, description, user_id, status, creation_time) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (board_id, title, description, user_id, "OPEN", utc_now())
+                    )
+                except sqlite3.IntegrityError as e:
+                    if "UNIQUE" in str(e):
+                        raise ApiError("Task title must be unique for the board")
+                    raise ApiError("User not found")
+
+            return json.dumps({"id": str(cursor.lastrowid)})
+
+        except ApiError:
+            raise
+        except json.JSONDecodeError:
+            raise ApiError("Invalid JSON input")
+        except Exception:
+            logger.exception("Unexpected error in add_task")
+            raise ApiError("Internal error")
 
     def update_task_status(self, request: str) -> str:
         try:
-            request_data = json.loads(request)
+            request_data = load_request(request)
             task_id = request_data.get('id')
             status = request_data.get('status')
 
             if not task_id or not status:
-                raise ValueError("Task ID and status are required")
+                raise ApiError("Task ID and status are required")
+            check_id(task_id, "Task ID")
             if status not in ["OPEN", "IN_PROGRESS", "COMPLETE"]:
-                raise ValueError("Invalid status value")
+                raise ApiError("Invalid status value")
+
+            task = self._conn.execute("SELECT status FROM tasks WHERE id = ?", (task_id,)).fetchone()
 
-            with open(self.db_path, 'r+') as file:
-                boards = json.load(file)
+            if task is None:
+                raise ApiError("Task not found")
+            if task[0] == status:
+                return json.dumps({"id": task_id})
 
-                for board in boards.values():
-                    if task_id in board['tasks']:
-                        board['tasks'][task_id]['status'] = status
-                        file.seek(0)
-                        json.dump(boards, file, indent=4)
-                        return json.dumps({"id": task_id})
+            with self._write():
+                cursor = self._conn.execute("UPDATE tasks SET status = ? WHERE id = ?", (status, task_id))
 
-                raise ValueError("Task not found")
+            if cursor.rowcount == 0:
+                raise ApiError("Task not found")
 
-        except Exception as e:
-            raise ValueError(traceback.format_exc())
+            return json.dumps({"id": task_id})
+
+        except ApiError:
+            raise
+        except json.JSONDecodeError:
+            raise ApiError("Invalid JSON input")
+        except Exception:
+            logger.exception("Unexpected error in update_task_status")
+            raise ApiError("Internal error")
 
     def list_boards(self, request: str) -> str:
         try:
-            request_data = json.loads(request)
+            request_data = load_request(request)
             team_id = request_data.get('id')
 
             if not team_id:
-                raise ValueError("Team ID is required")
+                raise ApiError("Team ID is required")
+            check_id(team_id, "Team ID")
 
-            with open(self.db_path, 'r') as file:
-                boards = json.load(file)
+            rows = self._read("SELECT id, name FROM boards WHERE team_id = ? AND status = 'OPEN'", (team_id,))
 
             open_boards = [
                 {
-                    "id": board_id,
-                    "name": board["name"]
+                    "id": str(board_id),
+                    "name": name
                 }
-                for board_id, board in boards.items()
-                if board["team_id"] == team_id and board["status"] == "OPEN"
+                for board_id, name in rows
             ]
 
             return json.dumps(open_boards)
 
-        except Exception as e:
-            raise ValueError(traceback.format_exc())
+        except ApiError:
+            raise
+        except json.JSONDecodeError:
+            raise ApiError("Invalid JSON input")
+        except Exception:
+            logger.exception("Unexpected error in list_boards")
+            raise ApiError("Internal error")
 
     def export_board(self, request: str) -> str:
         try:
-            request_data = json.loads(request)
+            request_data = load_request(request)
             board_id = request_data.get('id')
 
             if not board_id:
-                raise ValueError("Board ID is required")
+                raise ApiError("Board ID is required")
+            check_id(board_id, "Board ID")
 
-            with open(self.db_path, 'r') as file:
-                boards = json.load(file)
+            board = self._conn.execute(
+                "SELECT name, description, status FROM boards WHERE id = ?", (board_id,)
+            ).fetchone()
 
-            if board_id not in boards:
-                raise ValueError("Board not found")
+            if board is None:
+                raise ApiError("Board not found")
 
-            board = boards[board_id]
+            name, description, status = board
+            tasks = self._conn.execute(
+                "SELECT id, title, description, user_id, status, creation_time FROM tasks WHERE board_id = ? ORDER BY id",
+                (board_id,)
+            ).fetchall()
 
             os.makedirs('out', exist_ok=True)
 
             out_file = f"out/board_{board_id}.txt"
-            with open(out_file, 'w') as file:
-                file.write(f"Board: {board['name']}\n")
-                file.write(f"Description: {board['description']}\n")
-                file.write(f"Status: {board['status']}\n")
-                file.write("Tasks:\n")
-                for task_id, task in board['tasks'].items():
-                    file.write(f"- Task {task_id}: {task['title']} ({task['status']})\n")
-                    file.write(f"  Description: {task['description']}\n")
-                    file.write(f"  Assigned to: {task['user_id']}\n")
-                    file.write(f"  Created at: {task['creation_time']}\n")
+            parts = [
+                f"Board: {name}\n",
+                f"Description: {description}\n",
+                f"Status: {status}\n",
+                "Tasks:\n"
+            ]
+            parts.extend(
+                f"- Task {task_id}: {title} ({task_status})\n"
+                f"  Description: {task_description}\n"
+                f"  Assigned to: {user_id}\n"
+                f"  Created at: {creation_time}\n"
+                for task_id, title, task_description, user_id, task_status, creation_time in tasks
+            )
+
+            fd, tmp_file = tempfile.mkstemp(dir='out', prefix=f"board_{board_id}.", suffix='.tmp')
+            try:
+                with open(fd, 'w', buffering=1 << 20) as file:
+                    file.write(''.join(parts))
+                    file.flush()
+                    os.fsync(file.fileno())
+                os.chmod(tmp_file, EXPORT_FILE_MODE)
+                os.replace(tmp_file, out_file)
+            except BaseException:
+                os.unlink(tmp_file)
+                raise
 
             return json.dumps({"out_file": out_file})
 
-        except Exception as e:
-            raise ValueError(traceback.format_exc())
+        except ApiError:
+            raise
+        except json.JSONDecodeError:
+            raise ApiError("Invalid JSON input")
+        except Exception:
+            logger.exception("Unexpected error in export_board")
+            raise ApiError("Internal error")
@@ -0,0 +1,232 @@
+import datetime
+import json
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DB_PATH = 'db/planner.db'
+READ_CACHE_SIZE = 256
+WAL_CHECKPOINT_PAGES = 1000
+WAL_SIZE_LIMIT = 4 * 1024 * 1024
+LEGACY_JSON_FILES = ('users.json', 'teams.json', 'boards.json')
+LEGACY_IMPORT_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    display_name TEXT NOT NULL,
+    creation_time TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS teams (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL,
+    admin INTEGER NOT NULL REFERENCES users(id),
+    creation_time TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS team_users (
+    team_id INTEGER NOT NULL REFERENCES teams(id),
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    PRIMARY KEY (team_id, user_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS boards (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    team_id INTEGER NOT NULL REFERENCES teams(id),
+    name TEXT NOT NULL,
+    description TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'OPEN',
+    creation_time TEXT NOT NULL,
+    end_time TEXT,
+    UNIQUE (team_id, name)
+);
+
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    board_id INTEGER NOT NULL REFERENCES boards(id),
+    title TEXT NOT NULL,
+    description TEXT NOT NULL,
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    status TEXT NOT NULL DEFAULT 'OPEN',
+    creation_time TEXT NOT NULL,
+    UNIQUE (board_id, title)
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_users_name ON users(name);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_teams_name ON teams(name);
+CREATE INDEX IF NOT EXISTS idx_team_users_user ON team_users(user_id);
+CREATE INDEX IF NOT EXISTS idx_boards_team_status ON boards(team_id, status, name);
+CREATE INDEX IF NOT EXISTS idx_tasks_board_status ON tasks(board_id, status);
+"""
+
+
+def utc_now() -> str:
+    """Timestamp stored in creation_time and end_time columns."""
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+class SQLiteStore:
+    """
+    Shared persistence for the managers. All managers use one SQLite database file;
+    every thread gets its own connection, opened on first use and kept for reuse.
+    Read queries are cached per connection until the database changes.
+    Until the import is recorded as done, data from the old JSON files next to the database is imported.
+    """
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn.executescript(SCHEMA)
+        self._import_legacy_json(directory)
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA wal_autocheckpoint={WAL_CHECKPOINT_PAGES}")
+            conn.execute(f"PRAGMA journal_size_limit={WAL_SIZE_LIMIT}")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def _import_legacy_json(self, directory):
+        """
+        One-shot import of db/users.json, db/teams.json and db/boards.json written by the JSON storage.
+        User, team and board ids are kept; task ids were only unique per board, so tasks are renumbered.
+        Completion is recorded in PRAGMA user_version in the same transaction as the rows, so a failed
+        import is retried on the next start. Foreign keys are not enforced while importing because the
+        JSON storage never checked references; violations are logged afterwards.
+        """
+        conn = self._conn
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= LEGACY_IMPORT_VERSION:
+            return
+
+        rows = self._load_legacy_json(directory)
+
+        conn.execute("PRAGMA foreign_keys=OFF")
+        try:
+            with self._write():
+                if conn.execute("PRAGMA user_version").fetchone()[0] >= LEGACY_IMPORT_VERSION:
+                    return
+                if rows and conn.execute("SELECT 1 FROM users UNION ALL SELECT 1 FROM teams LIMIT 1").fetchone():
+                    logger.warning("%s already holds data, not importing legacy JSON from %s", self.db_path, directory)
+                elif rows:
+                    conn.executemany(
+                        "INSERT INTO users (id, name, display_name, creation_time) VALUES (?, ?, ?, ?)",
+                        rows['users']
+                    )
+                    conn.executemany(
+                        "INSERT INTO teams (id, name, description, admin, creation_time) VALUES (?, ?, ?, ?, ?)",
+                        rows['teams']
+                    )
+                    conn.executemany("INSERT INTO team_users (team_id, user_id) VALUES (?, ?)", rows['team_users'])
+                    conn.executemany(
+                        "INSERT INTO boards (id, team_id, name, description, status, creation_time, end_time) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        rows['boards']
+                    )
+                    conn.executemany(
+                        "INSERT INTO tasks (board_id, title, description, user_id, status, creation_time) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        rows['tasks']
+                    )
+                    logger.info("Imported legacy JSON from %s into %s", directory, self.db_path)
+                conn.execute(f"PRAGMA user_version = {LEGACY_IMPORT_VERSION}")
+                violations = conn.execute("PRAGMA foreign_key_check").fetchall()
+        finally:
+            conn.execute("PRAGMA foreign_keys=ON")
+
+        for table, rowid, parent, _ in violations:
+            logger.warning("Imported %s row %s references a missing %s row", table, rowid, parent)
+
+    @staticmethod
+    def _load_legacy_json(directory) -> dict:
+        """
+        Read the legacy JSON files into insert parameters. Raises ValueError naming the file when one
+        cannot be parsed or when its rows would break the unique constraints, so nothing is dropped.
+        """
+        legacy = {}
+        for file_name in LEGACY_JSON_FILES:
+            path = os.path.join(directory, file_name)
+            if os.path.exists(path):
+                with open(path) as file:
+                    try:
+                        # The JSON storage rewrote files in place without truncating, which can leave
+                        # trailing bytes after the document; raw_decode reads just the first document.
+                        legacy[file_name], _ = json.JSONDecoder().raw_decode(file.read().strip())
+                    except json.JSONDecodeError as e:
+                        raise ValueError(f"Cannot import {path}: {e}")
+        if not legacy:
+            return {}
+
+        try:
+            users = legacy.get('users.json', {})
+            teams = legacy.get('teams.json', {})
+            boards = legacy.get('boards.json', {})
+            rows = {
+                'users': [(user_id, user['name'], user['display_name'], user['creation_time'])
+                          for user_id, user in users.items()],
+                'teams': [(team_id, team['name'], team['description'], team['admin'], team['creation_time'])
+                          for team_id, team in teams.items()],
+                'team_users': sorted({(team_id, user_id)
+                                      for team_id, team in teams.items() for user_id in team.get('users', [])}),
+                'boards': [(board_id, board['team_id'], board['name'], board['description'], board['status'],
+                            board['creation_time'], board.get('end_time'))
+                           for board_id, board in boards.items()],
+                'tasks': [(board_id, task['title'], task['description'], task['user_id'], task['status'],
+                           task['creation_time'])
+                          for board_id, board in boards.items() for task in board.get('tasks', {}).values()],
+            }
+        except (AttributeError, KeyError, TypeError) as e:
+            raise ValueError(f"Cannot import legacy JSON from {directory}: malformed record ({e!r})")
+
+        for table, key in (('users', lambda row: row[1]), ('teams', lambda row: row[1]),
+                           ('boards', lambda row: (str(row[1]), row[2])), ('tasks', lambda row: (str(row[0]), row[1]))):
+            seen, duplicates = set(), set()
+            for row in rows[table]:
+                (duplicates if key(row) in seen else seen).add(key(row))
+            if duplicates:
+                raise ValueError(
+                    f"Cannot import legacy JSON from {directory}: duplicate {table} {sorted(duplicates)}; "
+                    "make them unique and restart"
+                )
+        return rows
+
+    @contextmanager
+    def _write(self):
+        """
+        Run the block in a transaction that takes the database write lock up front, so checks made
+        inside it cannot be invalidated by another writer before the changes are committed.
+        """
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        with conn:
+            yield conn
+
+    def _read(self, sql: str, params: tuple = ()) -> list:
+        """
+        Run a read-only query, returning the cached rows when the database is unchanged.
+        data_version moves when another connection commits, total_changes when this one writes.
+        """
+        conn = self._conn
+        version = (conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes)
+        cache = getattr(self._local, 'cache', None)
+        if cache is None or self._local.cache_version != version or len(cache) >= READ_CACHE_SIZE:
+            cache = self._local.cache = {}
+            self._local.cache_version = version
+        key = (sql, params)
+        if key not in cache:
+            cache[key] = conn.execute(sql, params).fetchall()
+        return cache[key]
@@ -1,9 +1,12 @@
-import datetime
-import json
-import os
-import traceback
+import json_codec as json
+import logging
+import sqlite3
 from abc import ABC, abstractmethod
-from user_base import UserManager
+from errors import ApiError
+from storage import DB_PATH, SQLiteStore, utc_now
+from validation import check_id, check_ids, check_object, check_text, load_request
+
+logger = logging.getLogger(__name__)
 
 class TeamBase(ABC):
     """
@@ -139,201 +142,268 @@ class TeamBase(ABC):
         """
         pass
     
-class TeamManager(TeamBase):
-    def __init__(self,db_path: str = 'db/teams.json'):
-        self.db_path=db_path
-        if not os.path.exists(self.db_path):
-            with open(self.db_path,'w') as file:
-                json.dump({},file)
+class TeamManager(TeamBase, SQLiteStore):
+    TEAM_FIELDS = ("name", "description", "admin")
+
+    def __init__(self, db_path: str = DB_PATH):
+        super().__init__(db_path)
+
+    def get_teams_for_user(self, user_id) -> list:
+        """
+        :return: (name, description, creation_time) rows of the teams the user belongs to
+        """
+        return self._read(
+            "SELECT t.name, t.description, t.creation_time FROM team_users tu "
+            "JOIN teams t ON t.id = tu.team_id WHERE tu.user_id = ? ORDER BY tu.team_id",
+            (user_id,)
+        )
 
     def create_team(self, request: str) -> str:
         try:
-            team_data = json.loads(request)
+            team_data = load_request(request)
             name = team_data.get('name')
             description = team_data.get('description')
             admin = team_data.get('admin')
 
             if not name or not description or not admin:
-                raise ValueError("Name, description, and admin are required")
+                raise ApiError("Name, description, and admin are required")
+            check_text(name, "Name")
+            check_text(description, "Description")
+            check_id(admin, "Admin")
             if len(name) > 64:
-                raise ValueError("Name must be 64 characters or less")
+                raise ApiError("Name must be 64 characters or less")
             if len(description) > 128:
-                raise ValueError("Description must be 128 characters or less")
-
-            with open(self.db_path, 'r+') as file:
-                teams = json.load(file)
-                if any(team['name'] == name for team in teams.values()):
-                    raise ValueError("Team name must be unique")
-
-                team_id = str(len(teams) + 1)
-                teams[team_id] = {
-                    "name": name,
-                    "description": description,
-                    "admin": admin,
-                    "creation_time": datetime.datetime.now().isoformat(),
-                    "users": []
-                }
-                file.seek(0)
-                json.dump(teams, file, indent=4)
-
-            return json.dumps({"id": team_id})
-
-        except Exception as e:
-            raise ValueError(traceback.format_exc())
+                raise ApiError("Description must be 128 characters or less")
+
+            try:
+                with self._write():
+                    cursor = self._conn.execute(
+                        "INSERT INTO teams (name, description, admin, creation_time) VALUES (?, ?, ?, ?)",
+                        (name, description, admin, utc_now())
+                    )
+            except sqlite3.IntegrityError as e:
+                if "UNIQUE" in str(e):
+                    raise ApiError("Team name must be unique")
+                raise ApiError("Admin user not found")
+
+            return json.dumps({"id": str(cursor.lastrowid)})
+
+        except ApiError:
+            raise
+        except json.JSONDecodeError:
+            raise ApiError("Invalid JSON input")
+        except Exception:
+            logger.exception("Unexpected error in create_team")
+            raise ApiError("Internal error")
         
     def list_teams(self) -> str:
         try:
-            with open(self.db_path, 'r') as file:
-                teams = json.load(file)
+            rows = self._read("SELECT name, description, creation_time, admin FROM teams")
 
             team_list = [
                 {
-                    "name": team["name"],
-                    "description": team["description"],
-                    "creation_time": team["creation_time"],
-                    "admin": team["admin"]
+                    "name": name,
+                    "description": description,
+                    "creation_time": creation_time,
+                    "admin": str(admin)
                 }
-                for team in teams.values()
+                for name, description, creation_time, admin in rows
             ]
 
             return json.dumps(team_list)
 
-        except Exception as e:
-            raise ValueError(traceback.format_exc())
+        except ApiError:
+            raise
+        except Exception:
+            logger.exception("Unexpected error in list_teams")
+            raise ApiError("Internal error")
         
     def describe_team(self, request: str) -> str:
         try:
-            request_data = json.loads(request)
+            request_data = load_request(request)
             team_id = request_data.get('id')
 
             if not team_id:
-                raise ValueError("Team ID is required")
+                raise ApiError("Team ID is required")
+            check_id(team_id, "Team ID")
 
-            with open(self.db_path, 'r') as file:
-                teams = json.load(file)
+            team = self._read("SELECT name, description, creation_time, admin FROM teams WHERE id = ?", (team_id,))
 
-            if team_id not in teams:
-                raise ValueError("Team not found")
+            if not team:
+                raise ApiError("Team not found")
 
-            team = teams[team_id]
+            name, description, creation_time, admin = team[0]
             return json.dumps({
-                "name": team["name"],
-                "description": team["description"],
-                "creation_time": team["creation_time"],
-                "admin": team["admin"]
+                "name": name,
+                "description": description,
+                "creation_time": creation_time,
+                "admin": str(admin)
             })
 
-        except Exception as e:
-            raise ValueError(traceback.format_exc())
+        except ApiError:
+            raise
+        except json.JSONDecodeError:
+            raise ApiError("Invalid JSON input")
+        except Exception:
+            logger.exception("Unexpected error in describe_team")
+            raise ApiError("Internal error")
 
     def update_team(self, request: str) -> str:
         try:
-            request_data = json.loads(request)
+            request_data = load_request(request)
             team_id = request_data.get('id')
             team_updates = request_data.get('team', {})
 
             if not team_id:
-                raise ValueError("Team ID is required")
+                raise ApiError("Team ID is required")
+            check_id(team_id, "Team ID")
+            check_object(team_updates, "Team details")
+            if "name" in team_updates:
+                check_text(team_updates["name"], "Name")
+            if "description" in team_updates:
+                check_text(team_updates["description"], "Description")
+            if "admin" in team_updates:
+                check_id(team_updates["admin"], "Admin")
             if "name" in team_updates and len(team_updates["name"]) > 64:
-                raise ValueError("Name must be 64 characters or less")
+                raise ApiError("Name must be 64 characters or less")
             if "description" in team_updates and len(team_updates["description"]) > 128:
-                raise ValueError("Description must be 128 characters or less")
-
-            with open(self.db_path, 'r+') as file:
-                teams = json.load(file)
-
-                if team_id not in teams:
-                    raise ValueError("Team not found")
-
-                if "name" in team_updates:
-                    new_name = team_updates["name"]
-                    if any(team['name'] == new_name for team in teams.values() if team != teams[team_id]):
-                        raise ValueError("Team name must be unique")
-
-                teams[team_id].update(team_updates)
-                file.seek(0)
-                json.dump(teams, file, indent=4)
+                raise ApiError("Description must be 128 characters or less")
+
+            fields = [field for field in self.TEAM_FIELDS if field in team_updates]
+            values = [team_updates[field] for field in fields]
+
+            unchanged = self._conn.execute(
+                f"SELECT {' AND '.join(f'{field} IS ?' for field in fields) or 1} FROM teams WHERE id = ?",
+                values + [team_id]
+            ).fetchone()
+
+            if unchanged is None:
+                raise ApiError("Team not found")
+            if unchanged[0]:
+                return json.dumps({"id": team_id})
+
+            try:
+                with self._write():
+                    cursor = self._conn.execute(
+                        f"UPDATE teams SET {', '.join(f'{field} = ?' for field in fields)} WHERE id = ?",
+                        values + [team_id]
+                    )
+            except sqlite3.IntegrityError as e:
+                if "UNIQUE" in str(e):
+                    raise ApiError("Team name must be unique")
+                raise ApiError("Admin user not found")
+
+            if cursor.rowcount == 0:
+                raise ApiError("Team not found")
 
             return json.dumps({"id": team_id})
 
-        except Exception as e:
-            raise ValueError(traceback.format_exc())
+        except ApiError:
+            raise
+        except json.JSONDecodeError:
+            raise ApiError("Invalid JSON input")
+        except Exception:
+            logger.exception("Unexpected error in update_team")
+            raise ApiError("Internal error")
 
     def add_users_to_team(self, request: str) -> str:
         try:
-            request_data = json.loads(request)
+            request_data = load_request(request)
             team_id = request_data.get('id')
             users = request_data.get('users', [])
 
             if not team_id:
-                raise ValueError("Team ID is required")
+                raise ApiError("Team ID is required")
+            check_id(team_id, "Team ID")
+            check_ids(users, "Users")
             if len(users) > 50:
-                raise ValueError("Cannot add more than 50 users to a team")
-
-            with open(self.db_path, 'r+') as file:
-                teams = json.load(file)
+                raise ApiError("Cannot add more than 50 users to a team")
 
-                if team_id not in teams:
-                    raise ValueError("Team not found")
+            with self._write():
+                if self._conn.execute("SELECT 1 FROM teams WHERE id = ?", (team_id,)).fetchone() is None:
+                    raise ApiError("Team not found")
 
-                teams[team_id]["users"] = list(set(teams[team_id]["users"] + users))
-                file.seek(0)
-                json.dump(teams, file, indent=4)
+                try:
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO team_users (team_id, user_id) VALUES (?, ?)",
+                        [(team_id, user_id) for user_id in users]
+                    )
+                except sqlite3.IntegrityError:
+                    raise ApiError("User not found")
 
             return json.dumps({"id": team_id})
 
-        except Exception as e:
-            raise ValueError(traceback.format_exc())
+        except ApiError:
+            raise
+        except json.JSONDecodeError:
+            raise ApiError("Invalid JSON input")
+        except Exception:
+            logger.exception("Unexpected error in add_users_to_team")
+            raise ApiError("Internal error")
 
     def remove_users_from_team(self, request: str) -> str:
         try:
-            request_data = json.loads(request)
+            request_data = load_request(request)
             team_id = request_data.get('id')
             users = request_data.get('users', [])
 
             if not team_id:
-                raise ValueError("Team ID is required")
+                raise ApiError("Team ID is required")
+            check_id(team_id, "Team ID")
+            check_ids(users, "Users")
 
-            with open(self.db_path, 'r+') as file:
-                teams = json.load(file)
+            with self._write():
+                if self._conn.execute("SELECT 1 FROM teams WHERE id = ?", (team_id,)).fetchone() is None:
+                    raise ApiError("Team not found")
 
-                if team_id not in teams:
-                    raise ValueError("Team not found")
-
-                teams[team_id]["users"] = [user for user in teams[team_id]["users"] if user not in users]
-                file.seek(0)
-                json.dump(teams, file, indent=4)
+                self._conn.executemany(
+                    "DELETE FROM team_users WHERE team_id = ? AND user_id = ?",
+                    [(team_id, user_id) for user_id in users]
+                )
 
             return json.dumps({"id": team_id})
 
-        except Exception as e:
-            raise ValueError(traceback.format_exc())
+        except ApiError:
+            raise
+        except json.JSONDecodeError:
+            raise ApiError("Invalid JSON input")
+        except Exception:
+            logger.exception("Unexpected error in remove_users_from_team")
+            raise ApiError("Internal error")
 
     def list_team_users(self, request: str) -> str:
         try:
-            request_data = json.loads(request)
+            request_data = load_request(request)
             team_id = request_data.get('id')
 
             if not team_id:
-                raise ValueError("Team ID is required")
+                raise ApiError("Team ID is required")
+            check_id(team_id, "Team ID")
 
-            with open(self.db_path, 'r') as file:
-                teams = json.load(file)
+            if not self._read("SELECT 1 FROM teams WHERE id = ?", (team_id,)):
+                raise ApiError("Team not found")
 
-            if team_id not in teams:
-                raise ValueError("Team not found")
+            rows = self._read(
+                "SELECT u.id, u.name, u.display_name FROM team_users tu "
+                "JOIN users u ON u.id = tu.user_id WHERE tu.team_id = ? ORDER BY tu.user_id",
+                (team_id,)
+            )
 
-            team_users = []
-            for user_id in teams[team_id]["users"]:
-                user_details = json.loads(UserManager.describe_user(json.dumps({"id":user_id})))
-                team_users.append({
-                    "id": user_id,
-                    "name": user_details["name"],
-                    "display_name": user_details["display_name"]
-                })
+            team_users = [
+                {
+                    "id": str(user_id),
+                    "name": name,
+                    "display_name": display_name
+                }
+                for user_id, name, display_name in rows
+            ]
 
             return json.dumps(team_users)
 
-        except Exception as e:
-            raise ValueError(traceback.format_exc())
-
+        except ApiError:
+            raise
+        except json.JSONDecodeError:
+            raise ApiError("Invalid JSON input")
+        except Exception:
+            logger.exception("Unexpected error in list_team_users")
+            raise ApiError("Internal error")
@@ -1,8 +1,15 @@
-import json
-import os
-import traceback
-import datetime
+import json_codec as json
+import logging
+import sqlite3
 from abc import ABC,abstractmethod
+from errors import ApiError
+from storage import DB_PATH, SQLiteStore, utc_now
+from validation import check_id, check_ids, check_object, check_text, load_request
+from team_base import TeamManager
+
+logger = logging.getLogger(__name__)
+
+
 class UserBase(ABC):
     """
     Base interface implementation for API's to manage users.
@@ -99,136 +106,165 @@ class UserBase(ABC):
         pass
 
 
-class UserManager(UserBase):
-    def __init__(self,db_path='db/users.json'):
-        self.db_path=db_path
-        if not os.path.exists(self.db_path):
-            with open(self.db_path,'w') as file:
-                json.dump({},file)
+class UserManager(UserBase, SQLiteStore):
+    USER_FIELDS = ("name", "display_name")
+
+    def __init__(self, db_path=DB_PATH):
+        super().__init__(db_path)
+        self.team_manager = TeamManager(db_path)
 
     def create_user(self, request:str) -> str:
         try:
-            user_data=json.loads(request)
+            user_data = load_request(request)
             name=user_data.get('name')
             display_name = user_data.get('display_name')
 
             if not name or not display_name:
-                raise ValueError("Name and display name are required")
+                raise ApiError("Name and display name are required")
+            check_text(name, "Name")
+            check_text(display_name, "Display name")
             if len(name) > 64 or len(display_name) > 64:
-                raise ValueError("Name and display name must be 64 characters or less")
-
-            
-            with open(self.db_path,'+r') as file:
-                users=json.load(file)
-                if any(user['name'] == name for user in users.values()):
-                    raise ValueError("User name must be unique")
-                user_id=str(len(users)+1)
-                users[user_id] = {
-                    "name": name,
-                    "display_name": display_name,
-                    "creation_time": datetime.datetime.now().isoformat()
-                }
-                file.seek(0)
-                json.dump(users,file)
-            return json.dumps({"status": "success", "user_id": user_id})
-        except Exception as e:
-            raise ValueError(traceback.format_exc())
+                raise ApiError("Name and display name must be 64 characters or less")
+
+            try:
+                with self._write():
+                    cursor = self._conn.execute(
+                        "INSERT INTO users (name, display_name, creation_time) VALUES (?, ?, ?)",
+                        (name, display_name, utc_now())
+                    )
+            except sqlite3.IntegrityError:
+                raise ApiError("User name must be unique")
+            return json.dumps({"status": "success", "user_id": str(cursor.lastrowid)})
+        except ApiError:
+            raise
+        except json.JSONDecodeError:
+            raise ApiError("Invalid JSON input")
+        except Exception:
+            logger.exception("Unexpected error in create_user")
+            raise ApiError("Internal error")
         
     def list_users(self) -> str:
         try:
-            with open(self.db_path,'r') as file:
-                users = json.load(file)
-            users_list=[
-                {
-                    "id":user['id'],
-                    "name":user['name'],
-                    "display_name": user["display_name"],
-                    "creation_time":user['creation_time']
-                }
-                for user in users.values()
-            ]
-            return json.dumps({"status": "success", "users_list": users_list})
+            rows = self._read(
+                "SELECT json_object('status', 'success', 'users_list', json_group_array(json_object("
+                "'id', CAST(id AS TEXT), 'name', name, 'display_name', display_name, 'creation_time', creation_time"
+                "))) FROM users"
+            )
+            return rows[0][0]
 
-        except Exception as e:
-            raise ValueError(traceback.format_exc())
+        except ApiError:
+            raise
+        except Exception:
+            logger.exception("Unexpected error in list_users")
+            raise ApiError("Internal error")
         
     def describe_user(self, request: str) -> str:
         try:
-            request_data = json.loads(request)
+            request_data = load_request(request)
             user_id = request_data.get('id')
             if not user_id:
-                raise ValueError("User ID is required")
-            with open(self.db_path, 'r') as f:
-                users = json.load(f)
-            if user_id not in users:
-                raise ValueError("User not found")
-            user = users[user_id]
+                raise ApiError("User ID is required")
+            check_id(user_id, "User ID")
+            rows = self._read("SELECT id, name, display_name, creation_time FROM users WHERE id = ?", (user_id,))
+            if not rows:
+                raise ApiError("User not found")
+            user = rows[0]
             user_data = {
-                "id":user['id'],
-                "name":user['name'],
-                "display_name": user["display_name"],
-                "creation_time":user['creation_time']
+                "id":str(user[0]),
+                "name":user[1],
+                "display_name": user[2],
+                "creation_time":user[3]
             }
             return json.dumps({"status": "success", "user_data": user_data})
-        except Exception as e:
-            raise ValueError(traceback.format_exc())
+        except ApiError:
+            raise
+        except json.JSONDecodeError:
+            raise ApiError("Invalid JSON input")
+        except Exception:
+            logger.exception("Unexpected error in describe_user")
+            raise ApiError("Internal error")
         
     def update_user(self, request: str) -> str:
         try:
-            request_data = json.loads(request)
+            request_data = load_request(request)
             user_id = request_data.get('id')
             user_details = request_data.get('user', {})
 
             if not user_id:
-                raise ValueError("User ID is required")
+                raise ApiError("User ID is required")
+            check_id(user_id, "User ID")
+            check_object(user_details, "User details")
+            if "name" in user_details:
+                check_text(user_details["name"], "Name")
+            if "display_name" in user_details:
+                check_text(user_details["display_name"], "Display name")
             if "name" in user_details and len(user_details["name"]) > 64:
-                raise ValueError("Name must be 64 characters or less")
+                raise ApiError("Name must be 64 characters or less")
             if "display_name" in user_details and len(user_details["display_name"]) > 128:
-                raise ValueError("Display name must be 128 characters or less")
+                raise ApiError("Display name must be 128 characters or less")
+
+            fields = [field for field in self.USER_FIELDS if field in user_details]
+            values = [user_details[field] for field in fields]
 
-            with open(self.db_path, 'r+') as file:
-                users = json.load(file)
+            unchanged = self._conn.execute(
+                f"SELECT {' AND '.join(f'{field} IS ?' for field in fields) or 1} FROM users WHERE id = ?",
+                values + [user_id]
+            ).fetchone()
 
-                if user_id not in users:
-                    raise ValueError("User not found")
+            if unchanged is None:
+                raise ApiError("User not found")
+            if unchanged[0]:
+                return json.dumps({"status": "success", "user_data": {"id": user_id}})
 
-                users[user_id].update(user_details)
-                file.seek(0)
-                json.dump(users, file, indent=4)
+            try:
+                with self._write():
+                    cursor = self._conn.execute(
+                        f"UPDATE users SET {', '.join(f'{field} = ?' for field in fields)} WHERE id = ?",
+                        values + [user_id]
+                    )
+            except sqlite3.IntegrityError:
+                raise ApiError("User name must be unique")
+
+            if cursor.rowcount == 0:
+                raise ApiError("User not found")
 
             return json.dumps({"status": "success", "user_data": {"id": user_id}})
 
-        except Exception as e:
-            raise ValueError(traceback.format_exc())
+        except ApiError:
+            raise
+        except json.JSONDecodeError:
+            raise ApiError("Invalid JSON input")
+        except Exception:
+            logger.exception("Unexpected error in update_user")
+            raise ApiError("Internal error")
         
     def get_user_teams(self, request: str) -> str:
         try:
-            request_data = json.loads(request)
+            request_data = load_request(request)
             user_id = request_data.get('id')
 
             if not user_id:
-                raise ValueError("User ID is required")
+                raise ApiError("User ID is required")
+            check_id(user_id, "User ID")
 
-            teams_db_path = 'db/teams.json'
-            if not os.path.exists(teams_db_path):
-                raise ValueError("Teams database not found")
+            rows = self.team_manager.get_teams_for_user(user_id)
 
-            with open(teams_db_path, 'r') as file:
-                teams = json.load(file)
-
-            user_teams = []
-            for team_id, team in teams.items():
-                if user_id in team.get("users", []):
-                    user_teams.append({
-                        "name": team["name"],
-                        "description": team["description"],
-                        "creation_time": team["creation_time"]
-                    })
+            user_teams = [
+                {
+                    "name": name,
+                    "description": description,
+                    "creation_time": creation_time
+                }
+                for name, description, creation_time in rows
+            ]
 
             return json.dumps(user_teams)
 
+        except ApiError:
+            raise
         except json.JSONDecodeError:
-            raise ValueError("Invalid JSON input")
-        except Exception as e:
-            raise ValueError(f"Error getting user teams: {str(e)}")
+            raise ApiError("Invalid JSON input")
+        except Exception:
+            logger.exception("Unexpected error in get_user_teams")
+            raise ApiError("Internal error")
         
@@ -0,0 +1,34 @@
+import json_codec as json
+from errors import ApiError
+
+
+def load_request(request) -> dict:
+    """Parse a request body, which must be a JSON object."""
+    if not isinstance(request, (str, bytes)):
+        raise ApiError("Request must be a JSON string")
+    data = json.loads(request)
+    if not isinstance(data, dict):
+        raise ApiError("Request must be a JSON object")
+    return data
+
+
+def check_id(value, label: str) -> None:
+    if isinstance(value, bool) or not isinstance(value, (str, int)):
+        raise ApiError(f"{label} must be a string or integer")
+
+
+def check_ids(values, label: str) -> None:
+    if not isinstance(values, list):
+        raise ApiError(f"{label} must be a list")
+    for value in values:
+        check_id(value, f"Each of {label.lower()}")
+
+
+def check_text(value, label: str) -> None:
+    if not isinstance(value, str):
+        raise ApiError(f"{label} must be a string")
+
+
+def check_object(value, label: str) -> None:
+    if not isinstance(value, dict):
+        raise ApiError(f"{label} must be a JSON object")